@@ -1,8 +1,15 @@
 # app/llm.py
 import os
 import re
-from typing import List, Dict
-from groq import Groq
+import random
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional
+import httpx
+import numpy as np
+import orjson
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,8 +18,25 @@ FALLBACK = "I don’t have enough information to answer."
 
 # Model config
 GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
-_groq = Groq(api_key=os.getenv("GROQ_API_KEY", ""))
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1")
+MAX_TOKENS = 96           # the prompt asks for ONE short sentence
+_EARLY_STOP_AT = 8        # a line break after this many chars ends the answer
+_GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
+_MAX_RETRIES = 2          # as the Groq SDK did: 429 / 5xx / connection errors
+_RETRY_BASE_DELAY = 0.5
+_RETRY_MAX_DELAY = 8.0
+
+# One HTTP/2 connection to Groq shared by concurrent /ask calls
+_http = httpx.AsyncClient(
+    base_url=GROQ_BASE_URL,
+    headers={"Authorization": f"Bearer {_GROQ_API_KEY}", "Content-Type": "application/json"},
+    http2=True,
+    timeout=30,
+)
 
+# Answer cache config
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+ANSWER_CACHE_MIN_SIM = float(os.getenv("ANSWER_CACHE_MIN_SIM", "0.95"))
 
 
 # Prompt builders 
@@ -21,17 +45,25 @@ SYSTEM = (
     f"If the answer is not clearly supported by the EVIDENCE, reply exactly: {FALLBACK}"
 )
 
+_INSTRUCTIONS = (
+    "Instructions:\n"
+    "- Answer using only the EVIDENCE above, as ONE short sentence in natural third person.\n"
+    "- Prefer starting with the person’s name exactly as it appears in the QUESTION when helpful.\n"
+    f"- If the EVIDENCE does not clearly contain the answer, reply exactly: {FALLBACK}"
+)
+
 def build_user_prompt(question: str, snippets: List[Dict]) -> str:
-    lines = [f"- [{s['user_name']} at {s['timestamp']}] {s['message']}" for s in snippets]
-    evidence = "\n".join(lines) if lines else "(none)"
-    return (
-        f"QUESTION:\n{question}\n\n"
-        f"EVIDENCE (relevant member messages):\n{evidence}\n\n"
-        "Instructions:\n"
-        "- Answer using only the EVIDENCE above, as ONE short sentence in natural third person.\n"
-        "- Prefer starting with the person’s name exactly as it appears in the QUESTION when helpful.\n"
-        f"- If the EVIDENCE does not clearly contain the answer, reply exactly: {FALLBACK}"
-    )
+    parts = ["QUESTION:\n", question, "\n\nEVIDENCE (relevant member messages):\n"]
+    append = parts.append
+    for s in snippets:
+        append("- [")
+        append(s["user_name"]); append(" at "); append(s["timestamp"])
+        append("] "); append(s["message"]); append("\n")
+    if not snippets:
+        append("(none)\n")
+    append("\n")
+    append(_INSTRUCTIONS)
+    return "".join(parts)
 
 # Helpers
 def _fb(reason: str) -> str:
@@ -47,28 +79,128 @@ def _postprocess(text: str) -> str:
     return ans
 
 
+def snippets_fingerprint(snippets: List[Dict]) -> bytes:
+    """Stable digest of the evidence messages, in order."""
+    h = hashlib.blake2b(digest_size=16)
+    for s in snippets:
+        h.update(s["message"].encode())
+        h.update(b"\0")
+    return h.digest()
+
+
+# Semantic answer cache
+class SemanticAnswerCache:
+    """LRU of answers keyed on evidence fingerprint + similar (cosine) query vector."""
+
+    def __init__(self, maxsize: int = ANSWER_CACHE_SIZE, min_sim: float = ANSWER_CACHE_MIN_SIM):
+        self.maxsize = maxsize
+        self.min_sim = min_sim
+        self._entries = OrderedDict()  # (fp, qvec bytes) -> answer
+        self._by_fp = {}               # fp -> {(fp, qvec bytes): qvec}
+        self._lock = threading.Lock()
+
+    def get(self, qvec: np.ndarray, fp: bytes) -> Optional[str]:
+        with self._lock:
+            group = self._by_fp.get(fp)
+            if not group:
+                return None
+            keys = list(group)
+            sims = np.stack([group[k] for k in keys]) @ qvec
+            best = int(np.argmax(sims))
+            if sims[best] < self.min_sim:
+                return None
+            self._entries.move_to_end(keys[best])
+            return self._entries[keys[best]]
+
+    def put(self, qvec: np.ndarray, fp: bytes, answer: str) -> None:
+        key = (fp, qvec.tobytes())
+        with self._lock:
+            self._entries[key] = answer
+            self._entries.move_to_end(key)
+            self._by_fp.setdefault(fp, {})[key] = qvec
+            while len(self._entries) > self.maxsize:
+                old, _ = self._entries.popitem(last=False)
+                group = self._by_fp[old[0]]
+                del group[old]
+                if not group:
+                    del self._by_fp[old[0]]
+
+
+# Request body: everything but the user prompt is serialized once
+_BODY_HEAD = orjson.dumps({
+    "model": GROQ_MODEL,
+    "temperature": 0.0,
+    "top_p": 1.0,
+    "max_tokens": MAX_TOKENS,
+    "stream": True,
+})[:-1] + b',"messages":[' + orjson.dumps({"role": "system", "content": SYSTEM}) + b',{"role":"user","content":'
+_BODY_TAIL = b"}]}"
+
+def _chat_body(prompt: str) -> bytes:
+    return _BODY_HEAD + orjson.dumps(prompt) + _BODY_TAIL
+
+def _retry_delay(attempt: int, r: Optional[httpx.Response] = None) -> float:
+    """Server's Retry-After when given, else exponential backoff with jitter (both capped)."""
+    if r is not None:
+        try:
+            return min(max(float(r.headers.get("retry-after", "")), 0.0), _RETRY_MAX_DELAY)
+        except ValueError:
+            pass
+    return min(_RETRY_BASE_DELAY * 2 ** attempt, _RETRY_MAX_DELAY) * (0.75 + random.random() / 4)
+
+async def _open_stream(body: bytes) -> httpx.Response:
+    """POST the chat request and return the streaming response, retrying transient failures."""
+    for attempt in range(_MAX_RETRIES + 1):
+        last = attempt == _MAX_RETRIES
+        try:
+            r = await _http.send(_http.build_request("POST", "/chat/completions", content=body), stream=True)
+        except httpx.TransportError:
+            if last:
+                raise
+            await asyncio.sleep(_retry_delay(attempt))
+            continue
+        if last or not (r.status_code == 429 or r.status_code >= 500):
+            return r
+        delay = _retry_delay(attempt, r)
+        await r.aclose()
+        await asyncio.sleep(delay)
+
+async def aclose() -> None:
+    """Close the shared Groq HTTP client."""
+    await _http.aclose()
+
+
 # Core function 
-def synthesize_answer(question: str, snippets: List[Dict]) -> str:
-    if not _groq.api_key:
+async def synthesize_answer(question: str, snippets: List[Dict]) -> str:
+    if not _GROQ_API_KEY:
         return _fb("no API/model key")
 
     prompt = build_user_prompt(question, snippets)
 
     try:
-        chat = _groq.chat.completions.create(
-            model=GROQ_MODEL,
-            messages=[
-                {"role": "system", "content": SYSTEM},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.0,
-            max_tokens=50000,
-        )
-        # print("GROQ full response:", chat)
-        choice = chat.choices[0]
-        # print("finish_reason:", getattr(choice, "finish_reason", None))
-        # print("message:", getattr(choice, "message", None))
-        raw = (chat.choices[0].message.content or "").strip()
+        text = ""
+        r = await _open_stream(_chat_body(prompt))
+        try:
+            r.raise_for_status()
+            # Server-sent events: "data: {chunk json}" lines, terminated by "data: [DONE]"
+            async for line in r.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                data = line[6:]
+                if data == "[DONE]":
+                    break
+                choices = orjson.loads(data).get("choices")
+                delta = (choices[0].get("delta") or {}).get("content") if choices else None
+                if not delta:
+                    continue
+                text += delta
+                if text.find("\n", _EARLY_STOP_AT) != -1:
+                    break
+        finally:
+            await r.aclose()
+
+        cut = text.find("\n", _EARLY_STOP_AT)
+        raw = (text[:cut] if cut != -1 else text).strip()
         ans = _postprocess(raw)
         # print("GROQ raw answer:", raw)
 
@@ -1,12 +1,13 @@
 # app/main.py
+import asyncio
 from functools import lru_cache
 from fastapi import FastAPI, Query
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import logging, traceback
 
 from .schemas import AskResponse
-from . import retrieval
+from . import llm, retrieval
 from .utils import (
     detect_topic,
     extract_candidate_name,
@@ -15,9 +16,9 @@ from .utils import (
     has_quantityish,
     extract_focus_terms,
 )
-from .llm import synthesize_answer
+from .llm import FALLBACK, SemanticAnswerCache, snippets_fingerprint, synthesize_answer
 
-app = FastAPI(title="Member QA Service")
+app = FastAPI(title="Member QA Service", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -34,7 +35,6 @@ def get_store():
 @app.on_event("startup")
 async def startup_event():
     # Warm caches/models shortly after bind without blocking startup
-    import asyncio
     async def _warm():
         await asyncio.sleep(0.2)
         try:
@@ -43,6 +43,10 @@ async def startup_event():
             print("[startup warm] non-fatal:", e, flush=True)
     asyncio.create_task(_warm())
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await llm.aclose()
+
 @app.get("/health")
 def health():
     return {"ok": True}
@@ -52,9 +56,10 @@ def root():
     return {"ok": True, "endpoints": ["/health", "/ask?question=..."]}
 
 logger = logging.getLogger("uvicorn.error")
+answer_cache = SemanticAnswerCache()
 
 @app.get("/ask", response_model=AskResponse)
-def ask(
+async def ask(
     question: str = Query(..., description="Natural language question"),
     debug: bool = Query(False, description="Return debugging info"),
 ):
@@ -62,15 +67,15 @@ def ask(
 
     store = get_store()
     try:
-        store.ensure_fresh()
+        await asyncio.to_thread(store.ensure_fresh)
     except Exception as e:
         logger.error("ensure_fresh failed: %r\n%s", e, traceback.format_exc(), exc_info=False)
         if debug:
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=503,
                 content={"answer": "init failed", "error": repr(e)},
             )
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=503,
             content={"answer": "I couldn’t reach the messages API right now. Please try again in a moment."},
         )
@@ -79,30 +84,40 @@ def ask(
     topic = detect_topic(q)
 
     query = q if topic == "general" else f"{q} topic:{topic}"
-    snippets = store.search(query, user_name=name, top_k=10)
+    snippets = await store.asearch(query, user_name=name, top_k=10)
 
     low = q.lower()
     focus = extract_focus_terms(q, name)
     if focus:
+        focus_set = frozenset(focus)
         def _has_focus_in_same_snippet(s):
-            text = f"{s['user_name']} {s['timestamp']} {s['message']}".lower()
-            same_user = (name is None) or (s["user_name"] == name)
-            return same_user and any(f in text for f in focus)
+            if name is not None and s["user_name"] != name:
+                return False
+            lc = s["_lc"]
+            return any(f in lc for f in focus_set)
         if not any(_has_focus_in_same_snippet(s) for s in snippets):
-            return JSONResponse(content={"answer": "I don’t have enough information to answer from the messages.(no message with focus terms)"})
+            return ORJSONResponse(content={"answer": "I don’t have enough information to answer from the messages.(no message with focus terms)"})
 
     if "when" in low and not any(has_dateish(s["message"]) for s in snippets):
-        return JSONResponse(content={"answer": "I don’t have enough information to answer when. I couldn’t find a date in the messages.(type guard when)"})
+        return ORJSONResponse(content={"answer": "I don’t have enough information to answer when. I couldn’t find a date in the messages.(type guard when)"})
 
     if ("how many" in low or "how much" in low):
-        evidence_text = " ".join(s["message"] for s in snippets)
-        if not has_quantityish(evidence_text):
-            return JSONResponse(content={"answer": "I don’t have enough information to answer the quantity from the messages.(type guard how many/much)"})
+        # Per message, so the memoized check hits on snippets seen before
+        if not any(has_quantityish(s["message"]) for s in snippets):
+            return ORJSONResponse(content={"answer": "I don’t have enough information to answer the quantity from the messages.(type guard how many/much)"})
 
     if not snippets:
-        return JSONResponse(content={"answer": "I don’t have enough information to answer from the messages.(no evidence at all)"})
-
-    answer = synthesize_answer(q, snippets)
+        return ORJSONResponse(content={"answer": "I don’t have enough information to answer from the messages.(no evidence at all)"})
+
+    # Reuse a grounded answer for a near-identical question over the same evidence
+    # (keyed on the recall query, whose vector _qvec_cache already holds)
+    qvec = await asyncio.to_thread(store._qvec_cache, query)
+    fp = snippets_fingerprint(snippets)
+    answer = answer_cache.get(qvec, fp) if qvec is not None else None
+    if answer is None:
+        answer = await synthesize_answer(q, snippets)
+        if qvec is not None and not answer.startswith(FALLBACK):
+            answer_cache.put(qvec, fp, answer)
 
     # When debug is on, return richer payload (bypass response_model filtering)
     if debug:
@@ -120,6 +135,6 @@ def ask(
             payload["answer"] = answer.get("final")
         else:
             payload["answer"] = answer
-        return JSONResponse(content=payload)
+        return ORJSONResponse(content=payload)
 
-    return JSONResponse(content={"answer": answer if not isinstance(answer, dict) else answer.get("final")})
+    return ORJSONResponse(content={"answer": answer if not isinstance(answer, dict) else answer.get("final")})
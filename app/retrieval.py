@@ -1,7 +1,14 @@
 # app/retrieval.py
-import os, time, threading, requests, numpy as np, heapq, re
-from typing import Optional
-from rank_bm25 import BM25Okapi
+import os, time, threading, hashlib, asyncio, json, requests, numpy as np, re
+from functools import lru_cache
+from typing import NamedTuple, Optional
+from requests.adapters import HTTPAdapter
+from scipy import sparse
+
+try:
+    import faiss
+except ImportError:  # brute-force numpy search fallback
+    faiss = None
 
 MESSAGES_URL_BASE = os.getenv(
     "MESSAGES_URL_BASE",
@@ -10,31 +17,71 @@ MESSAGES_URL_BASE = os.getenv(
 
 _PATHS = ["/messages", "/messages/"]
 _REFRESH_SEC = 600
+# Embeddings + BM25 tokens persisted here so a cold start skips re-encoding known messages
+# (private 0700 dir; plain .npy/.json, nothing is unpickled)
+_SNAPSHOT_DIR = os.getenv("MQA_SNAPSHOT_DIR", "/var/tmp/member-qa")
+_SNAPSHOT_EMBS = os.path.join(_SNAPSHOT_DIR, "mqa_embs.npy")
+_SNAPSHOT_META = os.path.join(_SNAPSHOT_DIR, "mqa_meta.json")
 _TIMEOUT = 30
-_token_re = re.compile(r"[a-z0-9']+")
+_EMB_DIM = 384
+# Host-side copy of the embeddings: fp16 when FAISS (SQ fp16) does the scan; numpy
+# has no fp16 BLAS kernel, so the brute-force fallback keeps fp32.
+_EMB_DTYPE = np.float16 if faiss is not None else np.float32
+_HNSW_M = 32
+_HNSW_EF_CONSTRUCTION = 200
+_HNSW_EF_SEARCH = 128
+_USER_BOOST = 1.15
+_RERANK_BATCH = 32
+_ENCODE_BATCH = 64
+_EMB_MIN_CAPACITY = 1024
+# "onnx" loads the int8 (AVX-512 VNNI) export of a model via optimum/onnxruntime
+_EMBEDDER_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+_EMBEDDER_BACKEND = os.getenv("EMBEDDER_BACKEND", "torch")
+_RERANKER_BACKEND = os.getenv("RERANKER_BACKEND", "torch")
+_ONNX_INT8_FILE = os.getenv("ONNX_INT8_FILE", "onnx/model_qint8_avx512_vnni.onnx")
+# Snapshots are only reusable by the exact encoder that produced them
+_EMBEDDER_ID = f"{_EMBEDDER_MODEL}|{_EMBEDDER_BACKEND}|{_ONNX_INT8_FILE if _EMBEDDER_BACKEND == 'onnx' else ''}"
+_token_re = re.compile(r"[a-z0-9']+", re.ASCII)
+# ... and their BM25 tokens only by the same tokenizer
+_TOKENIZER_ID = f"{_token_re.pattern}|{_token_re.flags}"
+
+# Keep-alive pool shared by all refreshes
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+_session.mount("https://", _adapter)
+_session.mount("http://", _adapter)
 
-def _authed_get(url: str):
-    headers = {"User-Agent": "member-qa/1.0"}
-    r = requests.get(url, timeout=_TIMEOUT, headers=headers, allow_redirects=False)
+def _authed_get(url: str, extra_headers: Optional[dict] = None):
+    headers = {"User-Agent": "member-qa/1.0", **(extra_headers or {})}
+    r = _session.get(url, timeout=_TIMEOUT, headers=headers, allow_redirects=False)
     if r.is_redirect or r.status_code in (301, 302, 303, 307, 308):
         loc = r.headers.get("location")
         if loc and loc.startswith("/"):
             loc = MESSAGES_URL_BASE + loc
         if loc:
-            r = requests.get(loc, timeout=_TIMEOUT, headers=headers, allow_redirects=False)
+            r = _session.get(loc, timeout=_TIMEOUT, headers=headers, allow_redirects=False)
     r.raise_for_status()
     return r
 
-def _get_messages_once(url: str):
-    r = _authed_get(url)
-    return r.json()
+def _get_messages_once(url: str, validators: Optional[dict] = None):
+    """Conditional GET: returns (None, validators) when upstream answers 304."""
+    extra = {}
+    if validators:
+        if validators.get("etag"):
+            extra["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            extra["If-Modified-Since"] = validators["last_modified"]
+    r = _authed_get(url, extra)
+    if r.status_code == 304:
+        return None, validators
+    return r.json(), {"etag": r.headers.get("etag"), "last_modified": r.headers.get("last-modified")}
 
-def _safe_fetch_messages():
+def _safe_fetch_messages(validators: Optional[dict] = None):
     last_err = None
     for p in _PATHS:
         url = MESSAGES_URL_BASE + p
         try:
-            return _get_messages_once(url)
+            return _get_messages_once(url, validators)
         except Exception as e:
             try:
                 body = getattr(e, 'response', None).text[:500] if getattr(e, 'response', None) else str(e)
@@ -44,17 +91,199 @@ def _safe_fetch_messages():
             last_err = e
     raise last_err
 
+def _model_kwargs(backend: str) -> dict:
+    """sentence-transformers constructor kwargs for the configured backend."""
+    if backend == "onnx":
+        return {"backend": "onnx", "model_kwargs": {"file_name": _ONNX_INT8_FILE}}
+    return {}
+
 def _tokenize(text: str):
     return _token_re.findall(text.lower())
 
-def _rrf(ranks, k=60):
-    scores = {}
-    for doc_id, pos_list in ranks.items():
-        s = 0.0
-        for pos in pos_list:
-            s += 1.0 / (k + pos)
-        scores[doc_id] = s
-    return scores
+@lru_cache(maxsize=4096)
+def _tokenize_query(query: str):
+    """Cached query tokenization (corpus docs go through _tokenize directly)."""
+    return tuple(_tokenize(query))
+
+class _BM25:
+    """Okapi BM25 (rank_bm25 defaults) scored over a sparse doc x vocab tf matrix."""
+
+    def __init__(self, corpus_tok, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        self.k1, self.b, self.epsilon = k1, b, epsilon
+        self.vocab = {}
+        self.tf = self._tf_rows(corpus_tok)
+        self.doc_len = self._doc_lens(corpus_tok)
+        self._update_stats()
+
+    def _tf_rows(self, corpus_tok):
+        """tf rows for corpus_tok, growing self.vocab with unseen terms."""
+        vocab, rows, cols = self.vocab, [], []
+        for r, toks in enumerate(corpus_tok):
+            for t in toks:
+                cols.append(vocab.setdefault(t, len(vocab)))
+                rows.append(r)
+        # COO -> CSC sums repeated (doc, term) pairs into term frequencies
+        return sparse.coo_matrix((np.ones(len(cols), dtype=np.float32), (rows, cols)),
+                                 shape=(len(corpus_tok), len(vocab))).tocsc()
+
+    @staticmethod
+    def _doc_lens(corpus_tok):
+        return np.fromiter((len(t) for t in corpus_tok), dtype=np.float32, count=len(corpus_tok))
+
+    def _update_stats(self):
+        n = self.tf.shape[0]
+        df = np.diff(self.tf.indptr)
+        idf = np.log(n - df + 0.5) - np.log(df + 0.5)
+        if len(idf):
+            idf[idf < 0] = self.epsilon * idf.mean()
+        self.idf = idf.astype(np.float32)
+        self.avg_dl = self.doc_len.mean() if n else 0.0
+        if self.avg_dl:
+            self._len_norm = self.k1 * (1.0 - self.b + self.b * self.doc_len / self.avg_dl)
+        else:
+            self._len_norm = np.full(n, self.k1, dtype=np.float32)
+
+    def extend(self, new_tok) -> "_BM25":
+        """New index with rows appended; tokenizes only the new docs, stats are recomputed."""
+        out = _BM25.__new__(_BM25)
+        out.k1, out.b, out.epsilon = self.k1, self.b, self.epsilon
+        out.vocab = dict(self.vocab)
+        new_tf = out._tf_rows(new_tok)
+        # Widen the old matrix to the grown vocab: new CSC columns are empty
+        n_cols = len(out.vocab)
+        indptr = np.pad(self.tf.indptr, (0, n_cols - self.tf.shape[1]), mode="edge")
+        old_tf = sparse.csc_matrix((self.tf.data, self.tf.indices, indptr), shape=(self.tf.shape[0], n_cols))
+        out.tf = sparse.vstack([old_tf, new_tf], format="csc")
+        out.doc_len = np.concatenate([self.doc_len, out._doc_lens(new_tok)])
+        out._update_stats()
+        return out
+
+    def get_scores(self, query_tok):
+        scores = np.zeros(self.tf.shape[0], dtype=np.float32)
+        q_ids = [self.vocab[t] for t in query_tok if t in self.vocab]
+        if not q_ids:
+            return scores
+        sub = self.tf[:, q_ids]
+        docs = sub.indices
+        cols = np.repeat(np.asarray(q_ids), np.diff(sub.indptr))
+        tf = sub.data
+        contrib = self.idf[cols] * tf * (self.k1 + 1.0) / (tf + self._len_norm[docs])
+        np.add.at(scores, docs, contrib)
+        return scores
+
+def _row_key(it) -> bytes:
+    """Content hash identifying a message across refreshes."""
+    raw = f"{it['user_name']}\0{it['timestamp']}\0{it['message']}".encode()
+    return hashlib.blake2b(raw, digest_size=16).digest()
+
+def _row_text(it) -> str:
+    return f"{it['user_name']} | {it['timestamp']} | {it['message']}"
+
+def _user_index(items):
+    """Sorted unique user names and per-row int32 ids (SoA) for vectorized boosts."""
+    if not items:
+        return [], np.zeros(0, dtype=np.int32)
+    uniq, inv = np.unique([it["user_name"] for it in items], return_inverse=True)
+    return uniq.tolist(), inv.astype(np.int32)
+
+def _append_rows(buf, n: int, rows):
+    """Write rows after the first n rows of buf, doubling capacity when full."""
+    need = n + len(rows)
+    if buf is None or need > len(buf):
+        cap = max(need, _EMB_MIN_CAPACITY, 2 * (len(buf) if buf is not None else 0))
+        grown = np.empty((cap, rows.shape[1]), dtype=rows.dtype)
+        if n:
+            grown[:n] = buf[:n]
+        buf = grown
+    buf[n:need] = rows
+    return buf
+
+def _save_snapshot(id_to_row, embs, corpus_tok):
+    """Atomically write embeddings (.npy) and row keys / tokens (.json)."""
+    try:
+        os.makedirs(_SNAPSHOT_DIR, mode=0o700, exist_ok=True)
+        tmp = _SNAPSHOT_EMBS + ".tmp.npy"
+        np.save(tmp, np.asarray(embs))
+        os.replace(tmp, _SNAPSHOT_EMBS)
+        # Row keys in row order (rows are always 0..n-1)
+        keys = [None] * len(id_to_row)
+        for k, i in id_to_row.items():
+            keys[i] = k.hex()
+        meta = {"embedder": _EMBEDDER_ID, "tokenizer": _TOKENIZER_ID, "n": len(embs),
+                "keys": keys, "corpus_tok": corpus_tok}
+        with open(_SNAPSHOT_META + ".tmp", "w") as f:
+            json.dump(meta, f, separators=(",", ":"))
+        os.replace(_SNAPSHOT_META + ".tmp", _SNAPSHOT_META)
+    except Exception as e:
+        print(f"[snapshot save] non-fatal: {e}", flush=True)
+
+def _load_snapshot():
+    """(key -> row, mmapped embeddings, tokens) from the last snapshot, or None."""
+    try:
+        st = os.stat(_SNAPSHOT_DIR)
+        if st.st_uid != os.getuid() or st.st_mode & 0o022:  # someone else could have planted it
+            return None
+        with open(_SNAPSHOT_META) as f:
+            meta = json.load(f)
+        embs = np.load(_SNAPSHOT_EMBS, mmap_mode="r", allow_pickle=False)
+        n = meta.get("n")
+        if (meta.get("embedder") != _EMBEDDER_ID or meta.get("tokenizer") != _TOKENIZER_ID
+                or len(embs) != n or embs.shape[1:] != (_EMB_DIM,)
+                or len(meta["keys"]) != n or len(meta["corpus_tok"]) != n):
+            return None
+        rows = {bytes.fromhex(k): i for i, k in enumerate(meta["keys"])}
+    except Exception:
+        return None
+    return rows, embs, meta["corpus_tok"]
+
+def _topn(scores, N: int):
+    """Indices of the N highest scores, best first (O(len) partition + O(N log N) sort)."""
+    if N >= len(scores):
+        return np.argsort(-scores)
+    part = np.argpartition(scores, -N)[-N:]
+    return part[np.argsort(-scores[part])]
+
+def _build_vec_index(embs):
+    """HNSW inner-product index over L2-normalized embeddings, stored as fp16 (None without faiss)."""
+    if faiss is None or len(embs) == 0:
+        return None
+    index = faiss.IndexHNSWSQ(embs.shape[1], faiss.ScalarQuantizer.QT_fp16, _HNSW_M, faiss.METRIC_INNER_PRODUCT)
+    index.hnsw.efConstruction = _HNSW_EF_CONSTRUCTION
+    index.hnsw.efSearch = _HNSW_EF_SEARCH
+    index.add(np.ascontiguousarray(embs, dtype=np.float32))
+    return index
+
+def _rrf(bm_idx, em_idx, k=60):
+    """Reciprocal rank fusion of two ranked id lists -> (ids, scores), best first.
+
+    Ties keep first-appearance order (BM25 list first), like a stable sort.
+    """
+    ids = np.concatenate([np.asarray(bm_idx, dtype=np.int64), np.asarray(em_idx, dtype=np.int64)])
+    if not len(ids):
+        return ids, np.zeros(0)
+    ranks = np.concatenate([np.arange(1, len(bm_idx) + 1), np.arange(1, len(em_idx) + 1)])
+    uniq, first, inv = np.unique(ids, return_index=True, return_inverse=True)
+    scores = np.bincount(inv, weights=1.0 / (k + ranks))
+    order = np.lexsort((first, -scores))
+    return uniq[order], scores[order]
+
+class _IndexState(NamedTuple):
+    """Everything a search reads, published as one unit so a refresh never mixes versions."""
+    items: list
+    texts: list
+    embeddings: Optional[np.ndarray]
+    vec_index: object                 # read-only once published: searches need no lock
+    bm25: Optional[_BM25]
+    corpus_tok: list
+    user_names: list
+    user_name_ids: np.ndarray
+    user_name_to_id: dict
+    id_to_row: dict
+
+def _index_state(items, texts, embeddings, vec_index, bm25, corpus_tok, id_to_row):
+    user_names, user_name_ids = _user_index(items)
+    return _IndexState(items, texts, embeddings, vec_index, bm25, corpus_tok, user_names,
+                       user_name_ids, {name: i for i, name in enumerate(user_names)}, id_to_row)
 
 class MessageStore:
     def __init__(self):
@@ -62,15 +291,19 @@ class MessageStore:
         self.reranker = None
         self._models_ready = False
 
-        self._last_fetch = 0.0
-        self.items = []
-        self.texts = []
-        self.embeddings = None
-        self.user_names = []
-        self.bm25 = None
-        self.bm25_corpus = []
+        self._state = _index_state([], [], None, None, None, [], {})
+        self._emb_buf = None
+
+        self._validators = None
+        self._refresher = None
 
         self._lock = threading.Lock()
+        self._fetch_lock = threading.RLock()
+        self._qvec_cache = lru_cache(maxsize=1024)(self._encode_query_uncached)
+
+    @property
+    def user_names(self):
+        return self._state.user_names
 
     def _ensure_models(self):
         """Load heavy models lazily, once."""
@@ -82,29 +315,112 @@ class MessageStore:
             os.environ.setdefault("HF_HOME", os.getenv("HF_HOME", "/var/tmp/hf-cache"))
             os.environ.setdefault("SENTENCE_TRANSFORMERS_HOME", os.getenv("SENTENCE_TRANSFORMERS_HOME", "/var/tmp/hf-cache"))
             from sentence_transformers import SentenceTransformer, CrossEncoder
-            self.embedder = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-            self.reranker = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2")
+            self.embedder = SentenceTransformer(_EMBEDDER_MODEL, **_model_kwargs(_EMBEDDER_BACKEND))
+            self.reranker = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2", **_model_kwargs(_RERANKER_BACKEND))
+            if _RERANKER_BACKEND != "onnx" and self.reranker.device.type == "cuda":
+                self.reranker.model.half()
+            self._qvec_cache.cache_clear()
             self._models_ready = True
 
     def _fetch(self):
-        """Refresh messages and indexes."""
-        data = _safe_fetch_messages()
-        items = data.get("items", [])
-        texts = [f"{it['user_name']} | {it['timestamp']} | {it['message']}" for it in items]
+        """Refresh messages and indexes (no-op rebuild when upstream answers 304)."""
+        with self._fetch_lock:
+            st = self._state
+            validators = self._validators if st.embeddings is not None else None
+            data, validators = _safe_fetch_messages(validators)
+            if data is None:
+                return
+            items = data.get("items", [])
+            keys = [_row_key(it) for it in items]
+            known = st.id_to_row
+            new_rows = [i for i, k in enumerate(keys) if k not in known]
+            appendable = (
+                st.embeddings is not None
+                and len(known) == len(st.items)
+                and len(keys) - len(new_rows) == len(st.items)
+                and known.keys() <= set(keys)
+            )
+            if appendable:
+                self._append_items([items[i] for i in new_rows], [keys[i] for i in new_rows], validators)
+            else:
+                self._rebuild(items, keys, validators)
+
+    def _encode(self, texts):
+        if not (self.embedder and texts):
+            return np.zeros((0, _EMB_DIM), dtype=np.float32)
+        return self.embedder.encode(texts, batch_size=_ENCODE_BATCH, convert_to_numpy=True, normalize_embeddings=True)
+
+    def _append_items(self, new_items, new_keys, validators):
+        """Delta refresh: encode, index and tokenize only messages not seen before."""
+        if not new_items:
+            with self._lock:
+                self._validators = validators
+            return
+        st = self._state
+        n = len(st.items)
+        new_texts = [_row_text(it) for it in new_items]
+        new_embs = self._encode(new_texts)
+        buf = _append_rows(self._emb_buf, n, new_embs.astype(_EMB_DTYPE, copy=False))
+        new_tok = [_tokenize(t) for t in new_texts]
+        bm25 = st.bm25.extend(new_tok) if st.bm25 is not None else _BM25(new_tok)
+        items = st.items + new_items
+        id_to_row = dict(st.id_to_row)
+        for j, k in enumerate(new_keys):
+            id_to_row[k] = n + j
+        embeddings = buf[:len(items)]
+        if st.vec_index is not None:
+            # Grow a copy (cheap next to an HNSW rebuild); the published index is never mutated
+            vec_index = faiss.clone_index(st.vec_index)
+            vec_index.add(np.ascontiguousarray(new_embs, dtype=np.float32))
+        else:
+            vec_index = _build_vec_index(embeddings)
+        new_st = _index_state(items, st.texts + new_texts, embeddings, vec_index, bm25,
+                              st.corpus_tok + new_tok, id_to_row)
 
-        embs = self.embedder.encode(texts, convert_to_numpy=True, normalize_embeddings=True) if (self.embedder and texts) else np.zeros((0, 384), dtype=np.float32)
-        corpus_tok = [_tokenize(t) for t in texts]
-        bm25 = BM25Okapi(corpus_tok) if texts else None
-        user_names = sorted({it["user_name"] for it in items})
+        with self._lock:
+            self._state = new_st
+            self._emb_buf = buf
+            self._validators = validators
+        _save_snapshot(id_to_row, embeddings, new_st.corpus_tok)
+
+    def _rebuild(self, items, keys, validators):
+        """Full rebuild (first load, rows removed or edited).
+
+        Embeddings and tokens of known messages are reused, from memory or, on a
+        cold start, from the on-disk snapshot.
+        """
+        texts = [_row_text(it) for it in items]
+        st = self._state
+        if st.embeddings is not None:
+            known, old_embs, old_tok = st.id_to_row, st.embeddings, st.corpus_tok
+        else:
+            known, old_embs, old_tok = _load_snapshot() or ({}, None, [])
+        embs = np.empty((len(items), _EMB_DIM), dtype=_EMB_DTYPE)
+        corpus_tok = [None] * len(items)
+        reuse = [(i, known[k]) for i, k in enumerate(keys) if k in known] if old_embs is not None else []
+        if reuse:
+            dst, src = zip(*reuse)
+            embs[list(dst)] = old_embs[list(src)]
+            for i, j in reuse:
+                corpus_tok[i] = old_tok[j]
+        reused = {i for i, _ in reuse}
+        missing = [i for i in range(len(items)) if i not in reused]
+        if missing:
+            embs[missing] = self._encode([texts[i] for i in missing])
+            for i in missing:
+                corpus_tok[i] = _tokenize(texts[i])
+        buf = _append_rows(None, 0, embs)
+        vec_index = _build_vec_index(embs)
+        id_to_row = {k: i for i, k in enumerate(keys)}
+        bm25 = _BM25(corpus_tok) if texts else None
+        new_st = _index_state(items, texts, buf[:len(items)], vec_index, bm25, corpus_tok, id_to_row)
 
         with self._lock:
-            self.items = items
-            self.texts = texts
-            self.embeddings = embs
-            self.bm25 = bm25
-            self.bm25_corpus = corpus_tok
-            self.user_names = list(user_names)
-            self._last_fetch = time.time()
+            self._state = new_st
+            self._emb_buf = buf
+            self._validators = validators
+        if missing:
+            _save_snapshot(id_to_row, embs, corpus_tok)
 
     def _warm_background(self):
         """Kick off a non-blocking warmup."""
@@ -112,67 +428,117 @@ class MessageStore:
             try:
                 self._ensure_models()
                 self._fetch()
+                self._start_refresher()
             except Exception as e:
                 print(f"[warmup] non-fatal: {e}", flush=True)
         threading.Thread(target=_bg, daemon=True).start()
 
+    def _start_refresher(self):
+        """Start the periodic background refresh thread (once)."""
+        if self._refresher is not None:  # per-request fast path, no lock
+            return
+        with self._lock:
+            if self._refresher is not None:
+                return
+            self._refresher = threading.Thread(target=self._refresh_loop, daemon=True)
+        self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(_REFRESH_SEC)
+            try:
+                self._fetch()
+            except Exception as e:
+                print(f"[refresh] non-fatal: {e}", flush=True)
+
     def ensure_fresh(self):
-        """Ensure models are loaded and data is recent."""
+        """Ensure models are loaded and data exists; later refreshes run in the background."""
         self._ensure_models()
-        if self.embeddings is None or (time.time() - self._last_fetch) > _REFRESH_SEC:
-            self._fetch()
+        if self._state.embeddings is None:
+            with self._fetch_lock:
+                if self._state.embeddings is None:
+                    self._fetch()
+        self._start_refresher()
 
-    def _embedding_topn(self, query: str, user_name: Optional[str], N: int = 100):
-        if not self.embedder or self.embeddings is None or len(self.embeddings) == 0:
-            return []
+    def _encode_query_uncached(self, query: str):
+        """Normalized query vector (read-only: shared through _qvec_cache)."""
+        if not self.embedder:
+            return None
         qvec = self.embedder.encode([query], convert_to_numpy=True, normalize_embeddings=True)[0]
-        sims = (self.embeddings @ qvec).ravel()
-        if user_name:
-            mask = np.array([1.15 if it["user_name"] == user_name else 1.0 for it in self.items], dtype=np.float32)
-            sims = sims * mask
-        idx = np.argsort(-sims)[:N]
-        return idx.tolist()
-
-    def _bm25_topn(self, query: str, N: int = 100):
-        if self.bm25 is None:
+        qvec.setflags(write=False)
+        return qvec
+
+    def _embedding_topn(self, st: _IndexState, query: str, user_name: Optional[str], N: int = 100):
+        if not self.embedder or st.embeddings is None or len(st.embeddings) == 0:
             return []
-        scores = self.bm25.get_scores(_tokenize(query))
-        idx = np.argsort(-scores)[:N]
-        return idx.tolist()
+        qvec = self._qvec_cache(query)
+        target = st.user_name_to_id.get(user_name) if user_name else None
+        if st.vec_index is not None:
+            # Approximate top-N from HNSW; the user boost reranks only these candidates.
+            D, I = st.vec_index.search(qvec[None, :].astype(np.float32), N)
+            keep = I[0] >= 0
+            cand, sims = I[0][keep], D[0][keep]
+            if target is not None:
+                sims = sims * np.where(st.user_name_ids[cand] == target, np.float32(_USER_BOOST), np.float32(1.0))
+            return cand[np.argsort(-sims)].tolist()
+        sims = (st.embeddings @ qvec).ravel()
+        if target is not None:
+            sims = sims * np.where(st.user_name_ids == target, np.float32(_USER_BOOST), np.float32(1.0))
+        return _topn(sims, N).tolist()
+
+    def _bm25_topn(self, st: _IndexState, query: str, N: int = 100):
+        if st.bm25 is None:
+            return []
+        scores = st.bm25.get_scores(_tokenize_query(query))
+        return _topn(scores, N).tolist()
 
     def search(self, query: str, user_name: Optional[str] = None, top_k: int = 10):
         """BM25 + embedding recall, RRF fuse, optional CrossEncoder rerank."""
         self.ensure_fresh()
-        bm_idx = self._bm25_topn(query, N=100)
-        em_idx = self._embedding_topn(query, user_name, N=100)
+        st = self._state
+        bm_idx = self._bm25_topn(st, query, N=100)
+        em_idx = self._embedding_topn(st, query, user_name, N=100)
+        return self._fuse_rerank(st, query, bm_idx, em_idx, top_k)
+
+    async def asearch(self, query: str, user_name: Optional[str] = None, top_k: int = 10):
+        """Async search: BM25 and embedding recall run concurrently in worker threads.
 
-        ranks = {}
-        for r, i in enumerate(bm_idx): ranks.setdefault(i, []).append(r + 1)
-        for r, i in enumerate(em_idx): ranks.setdefault(i, []).append(r + 1)
-        rrf_scores = _rrf(ranks, k=60)
+        Callers run ensure_fresh first (ask does, to answer 503 when the messages API is down).
+        """
+        # One index state for all three hops, however many refreshes land in between
+        st = self._state
+        bm_idx, em_idx = await asyncio.gather(
+            asyncio.to_thread(self._bm25_topn, st, query, 100),
+            asyncio.to_thread(self._embedding_topn, st, query, user_name, 100),
+        )
+        return await asyncio.to_thread(self._fuse_rerank, st, query, bm_idx, em_idx, top_k)
 
-        topM = heapq.nlargest(60, rrf_scores.items(), key=lambda kv: kv[1])
-        cand_idx = [i for (i, _) in topM]
+    def _fuse_rerank(self, st: _IndexState, query: str, bm_idx, em_idx, top_k: int):
+        """RRF-fuse the two recall lists, then CrossEncoder-rerank the head."""
+        fused_idx, fused_scores = _rrf(bm_idx, em_idx, k=60)
+        cand_idx = fused_idx[:60].tolist()
+        rrf_scores = dict(zip(cand_idx, fused_scores[:60].tolist()))
         if not cand_idx:
             return []
 
         if self._models_ready:
-            from numpy import asarray
-            pairs = [(query, self.texts[i]) for i in cand_idx]
-            ce_scores = self.reranker.predict(pairs)
-            order = np.argsort(-asarray(ce_scores))[:top_k]
+            pairs = [(query, st.texts[i]) for i in cand_idx]
+            ce_scores = self.reranker.predict(pairs, batch_size=_RERANK_BATCH, convert_to_numpy=True, show_progress_bar=False)
+            order = np.argsort(-np.asarray(ce_scores))[:top_k]
             chosen = [cand_idx[j] for j in order]
         else:
             chosen = cand_idx[:top_k]
 
         results = []
         for i in chosen:
-            it = self.items[i]
+            it = st.items[i]
             results.append({
                 "user_name": it["user_name"],
                 "timestamp": it["timestamp"],
                 "message": it["message"],
                 "score": float(rrf_scores[i]),
+                # lowercased "user timestamp message" for the focus-term gate in ask
+                "_lc": f"{it['user_name']} {it['timestamp']} {it['message']}".lower(),
             })
         return results
 
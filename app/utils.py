@@ -1,107 +1,283 @@
 # app/utils.py
 import re
-from typing import List, Optional, Tuple
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+import ahocorasick
+import numpy as np
 from rapidfuzz import fuzz, process
 
+try:
+    import re2
+except ImportError:  # stdlib re fallback
+    re2 = None
+
+def _automaton(pairs: Iterable[Tuple[str, str]]) -> "ahocorasick.Automaton":
+    """Aho–Corasick automaton over (keyword, payload) pairs: one pass finds every hit."""
+    A = ahocorasick.Automaton()
+    for word, payload in pairs:
+        A.add_word(word, payload)
+    A.make_automaton()
+    return A
+
 def normalize_text(s: str) -> str:
     """Trim + collapse whitespace."""
-    return " ".join(s.strip().split())
+    # Printable ASCII has no whitespace but " ", so without a double space only the ends can need work
+    if "  " not in s and s.isascii() and s.isprintable():
+        return s.strip()
+    return " ".join(s.split())
+
+_CAPS = re.compile(r"[A-Z][a-zA-Z'’\-]+(?:\s+[A-Z][a-zA-Z'’\-]+)*")
+_WORD = re.compile(r"[a-zA-Z][a-zA-Z\-']+")
+
+@lru_cache(maxsize=1024)
+def _scan(question: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """(capitalized spans, lowercased words) of a question, shared by the extractors."""
+    caps = _CAPS.findall(question)
+    if question.isascii():  # lowercasing keeps every match, so do it once
+        words = _WORD.findall(question.lower())
+    else:
+        words = [w.lower() for w in _WORD.findall(question)]
+    return tuple(caps), tuple(words)
+
+class _NameIndex(NamedTuple):
+    source: List[str]                 # the caller's list (kept alive so its id stays valid)
+    names: Tuple[str, ...]
+    norm: List[str]                   # normalized lowercase names: RapidFuzz can skip its processor
+    lens: List[int]                   # sorted token-set lengths ...
+    by_len: List[int]                 # ... and the name index for each of them
+    by_token: Dict[str, List[int]]    # token -> indices of names containing it
+
+def _token_set_len(s: str) -> int:
+    """Length of the sorted unique tokens joined by spaces (what token_set_ratio compares)."""
+    return len(" ".join(sorted(set(s.split()))))
+
+def _build_name_index(all_names: List[str]) -> _NameIndex:
+    norm = [normalize_text(n).lower() for n in all_names]
+    order = sorted(range(len(norm)), key=lambda i: _token_set_len(norm[i]))
+    by_token: Dict[str, List[int]] = {}
+    for i, n in enumerate(norm):
+        for t in set(n.split()):
+            by_token.setdefault(t, []).append(i)
+    return _NameIndex(all_names, tuple(all_names), norm,
+                      [_token_set_len(norm[i]) for i in order], order, by_token)
+
+# The store swaps in a new user_names list on refresh (never mutates it), so the
+# list's identity is the corpus version.
+_names_registry: Dict[int, _NameIndex] = {}
+_NAME_CUTOFF = 70.0
+_NAME_SURE = 90.0  # a capitalized span scoring this high skips the full-question pass
+# With no shared token, token_set_ratio is an Indel ratio of the token-set strings,
+# bounded by 2*min/(la+lb); reaching the cutoff needs lengths within this factor.
+_LEN_FACTOR = (2.0 - _NAME_CUTOFF / 100.0) / (_NAME_CUTOFF / 100.0)
+
+def _name_candidates(index: _NameIndex, q: str) -> Optional[List[int]]:
+    """Indices of names that can reach _NAME_CUTOFF against q (None: no useful pruning)."""
+    L = _token_set_len(q)
+    lo = bisect_left(index.lens, L / _LEN_FACTOR - 1)
+    hi = bisect_right(index.lens, L * _LEN_FACTOR + 1)
+    cand = set(index.by_len[lo:hi])
+    for t in set(q.split()):
+        cand.update(index.by_token.get(t, ()))
+    if len(cand) * 2 >= len(index.names):
+        return None
+    return sorted(cand)
+
+def _names_key(all_names: List[str]) -> int:
+    key = id(all_names)
+    entry = _names_registry.get(key)
+    if entry is None or entry.source is not all_names:
+        # New corpus: old results are stale
+        _names_registry.clear()
+        _extract_cached.cache_clear()
+        _names_registry[key] = _build_name_index(all_names)
+    return key
 
 def extract_candidate_name(question: str, all_names: List[str]) -> Tuple[Optional[str], float]:
     """Fuzzy-match a person name from the question against known names."""
-    caps = re.findall(r"[A-Z][a-zA-Z'’\-]+(?:\s+[A-Z][a-zA-Z'’\-]+)*", question)
+    return _extract_cached(question, _names_key(all_names))
+
+@lru_cache(maxsize=4096)
+def _extract_cached(question: str, names_key: int) -> Tuple[Optional[str], float]:
+    index = _names_registry[names_key]
+    caps = _scan(question)[0]
     queries = [max(caps, key=len)] if caps else []
     queries.append(question)
 
     best_name, best_score = None, 0.0
     for q in queries:
-        match = process.extractOne(q, all_names, scorer=fuzz.token_set_ratio)
+        qn = normalize_text(q).lower()
+        cand = _name_candidates(index, qn)
+        choices = index.norm if cand is None else [index.norm[i] for i in cand]
+        match = process.extractOne(qn, choices, scorer=fuzz.token_set_ratio,
+                                   processor=None, score_cutoff=_NAME_CUTOFF)
         if match:
-            cand, score, _ = match
+            _, score, idx = match
             if score > best_score:
-                best_name, best_score = cand, float(score)
-    return (best_name, best_score) if best_score >= 70.0 else (None, 0.0)
+                best_name, best_score = index.names[idx if cand is None else cand[idx]], score
+        if best_score >= _NAME_SURE:
+            break
+    return (best_name, best_score) if best_score >= _NAME_CUTOFF else (None, 0.0)
+
+def extract_candidate_names(questions: List[str], all_names: List[str]) -> List[Tuple[Optional[str], float]]:
+    """Batch name matching (e.g. eval runs): one RapidFuzz cdist over all questions.
+
+    Each question is scored by its longest capitalized span, or the whole question
+    when it has none, so this is the single-query variant of extract_candidate_name.
+    """
+    if not questions:
+        return []
+    index = _names_registry[_names_key(all_names)]
+    if not index.names:
+        return [(None, 0.0)] * len(questions)
+    queries = []
+    for q in questions:
+        caps = _scan(q)[0]
+        queries.append(normalize_text(max(caps, key=len) if caps else q).lower())
+
+    # Score only names that some query can still match
+    cols: Optional[List[int]] = []
+    for qn in queries:
+        cand = _name_candidates(index, qn)
+        if cand is None:
+            cols = None
+            break
+        cols.extend(cand)
+    cols = None if cols is None else sorted(set(cols))
+    choices = index.norm if cols is None else [index.norm[i] for i in cols]
+    if not choices:
+        return [(None, 0.0)] * len(questions)
+
+    scores = process.cdist(queries, choices, scorer=fuzz.token_set_ratio, processor=None,
+                           score_cutoff=_NAME_CUTOFF, dtype=np.float64, workers=-1)
+    best = scores.argmax(axis=1)
+    top = scores[np.arange(len(queries)), best]
+    out = []
+    for j, score in zip(best.tolist(), top.tolist()):
+        if score >= _NAME_CUTOFF:
+            out.append((index.names[j if cols is None else cols[j]], score))
+        else:
+            out.append((None, 0.0))
+    return out
+
+# In priority order: the first topic with any keyword hit wins
+_TOPIC_KEYWORDS = (
+    ("travel", ["book", "flight", "hotel", "suite", "room", "villa", "check-in", "itinerary", "trip", "travel"]),
+    ("dining", ["restaurant", "dinner", "table", "reservation", "chef’s table", "chef's table"]),
+    ("billing", ["invoice", "billing", "charge", "payment", "renewal", "transaction", "points", "loyalty"]),
+)
+_TOPIC_AC = _automaton((k, label) for label, kws in _TOPIC_KEYWORDS for k in kws)
 
 def detect_topic(question: str) -> str:
     """Very light keyword-based topic tag."""
-    q = question.lower()
-    if any(k in q for k in ["book", "flight", "hotel", "suite", "room", "villa", "check-in", "itinerary", "trip", "travel"]):
-        return "travel"
-    if any(k in q for k in ["restaurant", "dinner", "table", "reservation", "chef’s table", "chef's table"]):
-        return "dining"
-    if any(k in q for k in ["invoice", "billing", "charge", "payment", "renewal", "transaction", "points", "loyalty"]):
-        return "billing"
+    hits = set()
+    for _, label in _TOPIC_AC.iter(question.lower()):
+        if label == "travel":
+            return label
+        hits.add(label)
+    for label, _ in _TOPIC_KEYWORDS:
+        if label in hits:
+            return label
     return "general"
 
-_GENERIC = {
+_GENERIC = frozenset({
     "what","which","who","when","where","why","how","much","many",
     "plan","planning","trip","travel","vacation","book","booking","secure","arrange","need","want",
     "restaurant","restaurants","dinner","reservation","reservations","table","tables","seat","seats",
     "family","please","thanks","thank","you","my","his","her","their",
     "the","a","an","at","for","to","in","on","with","of","and","or",
     "is","are","was","were","do","does","did"
-}
-_WORD = re.compile(r"[a-zA-Z][a-zA-Z\-']+")
+})
+_QUOTED = re.compile(r'"([^"]+)"|“([^”]+)”|\'([^\']+)\'')
 
 def extract_focus_terms(question: str, person_name: Optional[str]) -> List[str]:
     """Return up to 5 specific terms/phrases to gate evidence."""
     q = question.strip()
 
     # Keep quoted phrases verbatim
-    quoted = re.findall(r'"([^"]+)"|“([^”]+)”|\'([^\']+)\'', q)
-    phrases = [t for tup in quoted for t in tup if t]
-
-    words = [w.lower() for w in _WORD.findall(q)]
-    name_tokens = set(person_name.lower().split()) if person_name else set()
+    phrases = [m.group(1) or m.group(2) or m.group(3) for m in _QUOTED.finditer(q)]
 
-    focus_words: List[str] = []
-    for w in words:
-        if len(w) <= 2: continue
-        if w in name_tokens: continue
-        if w in _GENERIC: continue
-        focus_words.append(w)
+    words = _scan(q)[1]
+    # One probe per token against generic words + the person's own name tokens
+    skip = _GENERIC.union(person_name.lower().split()) if person_name else _GENERIC
+    focus_words = [w for w in words if len(w) > 2 and w not in skip]
 
     out: List[str] = []
     seen = set()
-    for t in phrases + focus_words:
+    for t in phrases:
         t = t.strip().lower()
         if t and t not in seen:
             seen.add(t)
             out.append(t)
-    return out[:5]
-
-_DATEISH = re.compile(
-    r"""
-    (?:\b\d{4}-\d{2}-\d{2}\b)
-  | (?:\b\d{1,2}[/-]\d{1,2}(?:[/-]\d{2,4})?\b)
-  | (?:\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)
-        (?:uary|ch|ril|e|y|e|y|ust|tember|ober|ember)?
-        \s+\d{1,2}(?:,\s*\d{4})?\b)
-  | (?:\b(?:today|tomorrow|tonight|tonite|yesterday)\b)
-  | (?:\b(?:this|next|coming)?\s*
-        (?:mon|tue|tues|wed|thu|thur|thurs|fri|sat|sun
-        |monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b)
-  | (?:\b(?:this|next)\s+(?:week|weekend|month|quarter|year)\b)
-  | (?:\b(?:first|second|third|fourth)\s+week\s+of\s+
-        (?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec
-        |january|february|march|april|may|june|july|august|september|october|november|december)\b)
-    """,
-    re.IGNORECASE | re.VERBOSE,
-)
+            if len(out) >= 5:
+                return out
+    # focus_words come out of _scan already lowercased
+    for t in focus_words:
+        if t not in seen:
+            seen.add(t)
+            out.append(t)
+            if len(out) >= 5:
+                break
+    return out
+
+_MONTHS_SHORT = "jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec"
+_MONTHS_LONG = "january|february|march|april|may|june|july|august|september|october|november|december"
+_WEEKDAYS = "mon|tue|tues|wed|thu|thur|thurs|fri|sat|sun|monday|tuesday|wednesday|thursday|friday|saturday|sunday"
+# Plain (non-VERBOSE) syntax shared by RE2 and the stdlib fallback
+_DATE_SRC = "|".join(f"(?:{p})" for p in (
+    r"\b\d{4}-\d{2}-\d{2}\b",
+    r"\b\d{1,2}[/-]\d{1,2}(?:[/-]\d{2,4})?\b",
+    rf"\b(?:{_MONTHS_SHORT})(?:uary|ch|ril|e|y|e|y|ust|tember|ober|ember)?\s+\d{{1,2}}(?:,\s*\d{{4}})?\b",
+    r"\b(?:today|tomorrow|tonight|tonite|yesterday)\b",
+    rf"\b(?:this|next|coming)?\s*(?:{_WEEKDAYS})\b",
+    r"\b(?:this|next)\s+(?:week|weekend|month|quarter|year)\b",
+    rf"\b(?:first|second|third|fourth)\s+week\s+of\s+(?:{_MONTHS_SHORT}|{_MONTHS_LONG})\b",
+))
 
+_DATEISH = re.compile(_DATE_SRC, re.IGNORECASE)
+# Python's \s on ASCII text; RE2's \s lacks \v and \x1c-\x1f
+_ASCII_SPACE = r"[\t\n\x0b\f\r \x1c-\x1f]"
+
+def _compile_dateish_ascii():
+    """DFA-based RE2 when available (linear time, no backtracking), else stdlib re.
+
+    RE2's word boundaries and digit/space classes are ASCII-only, so it only sees ASCII text.
+    """
+    if re2 is not None:
+        try:
+            return re2.compile("(?i)" + _DATE_SRC.replace(r"\s", _ASCII_SPACE))
+        except re2.error:
+            pass
+    return _DATEISH
+
+_DATEISH_ASCII = _compile_dateish_ascii()
+
+@lru_cache(maxsize=8192)
 def has_dateish(text: str) -> bool:
-    return bool(_DATEISH.search(text or ""))
+    text = text or ""
+    return bool((_DATEISH_ASCII if text.isascii() else _DATEISH).search(text))
 
-_NUMBER_WORDS = {
+_NUMBER_WORDS = frozenset({
     "zero","one","two","three","four","five","six","seven","eight","nine","ten",
     "eleven","twelve","thirteen","fourteen","fifteen","sixteen","seventeen",
     "eighteen","nineteen","twenty","thirty","forty","fifty","sixty","seventy",
     "eighty","ninety","hundred","thousand","million"
-}
+})
+_NUMWORD_AC = _automaton((w, w) for w in _NUMBER_WORDS)
 
+_DIGITS = frozenset("0123456789")
+
+@lru_cache(maxsize=8192)
 def has_quantityish(text: str) -> bool:
     """True if text contains a digit or number word."""
     t = (text or "").lower()
-    if re.search(r"\b\d+\b", t):
+    if not _DIGITS.isdisjoint(t):
+        return True
+    for _ in _NUMWORD_AC.iter(t):
         return True
-    return any(w in t for w in _NUMBER_WORDS)
+    return False
+
+def _clear_caches() -> None:
+    """Drop every memoized per-text result."""
+    for fn in (_scan, _extract_cached, has_dateish, has_quantityish):
+        fn.cache_clear()